@@ -1,5 +1,4 @@
-from fastapi import FastAPI
-from tortoise.contrib.fastapi import register_tortoise
+from tortoise.contrib.fastapi import RegisterTortoise
 from app.helpers.constant import DB_URL
 
 TORTOISE_ORM = {
@@ -13,20 +12,29 @@ TORTOISE_ORM = {
 }
 
 
-def init_db(app: FastAPI) -> None:
+# Registered globally so the models are reachable from every request task, not only the lifespan task
+ORM = RegisterTortoise(
+    db_url=DB_URL,
+    modules={"models": ["app.database.models.user", "app.database.models.patient"]},
+    generate_schemas=True
+)
+
+
+async def init_db() -> None:
+    """
+        Initializes Tortoise ORM with the application models and generates the missing schemas.
+
+        Returns:
+            None
     """
-        Initializes the database by registering Tortoise ORM with the provided FastAPI 'app'.
+    await ORM.init_orm()
 
-        Parameters:
-            app: FastAPI - The FastAPI instance to register Tortoise ORM with.
+
+async def close_db() -> None:
+    """
+        Closes every Tortoise ORM connection, releasing the database pool.
 
         Returns:
             None
     """
-    register_tortoise(
-        app,
-        db_url=DB_URL,
-        modules={"models": ["app.database.models.user", "app.database.models.patient"]},
-        generate_schemas=True,
-        add_exception_handlers=False
-    )
\ No newline at end of file
+    await ORM.close_orm()
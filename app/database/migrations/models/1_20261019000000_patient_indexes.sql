@@ -0,0 +1,15 @@
+-- upgrade --
+-- "patient" is created by Tortoise's generate_schemas on startup, not by init.sql. On a fresh database the
+-- table does not exist yet and generate_schemas creates these indexes itself, under the same names.
+DO $$
+BEGIN
+    IF to_regclass('patient') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS "idx_patient_created_c3a5da" ON "patient" ("created_by_id");
+        CREATE INDEX IF NOT EXISTS "idx_patient_name_6f1019" ON "patient" ("name");
+        CREATE INDEX IF NOT EXISTS "idx_patient_age_6757ae" ON "patient" ("age");
+    END IF;
+END $$;
+-- downgrade --
+DROP INDEX IF EXISTS "idx_patient_created_c3a5da";
+DROP INDEX IF EXISTS "idx_patient_name_6f1019";
+DROP INDEX IF EXISTS "idx_patient_age_6757ae";
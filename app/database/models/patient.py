@@ -10,6 +10,10 @@ class Patient(Model):
     address = fields.CharField(max_length=100)
     created_by = fields.ForeignKeyField('models.User', related_name='created_patients')
 
+    class Meta:
+        # Backs the filters and sorting of GET /patients
+        indexes = (("created_by_id",), ("name",), ("age",))
+
 
 Patient_Pydantic = pydantic_model_creator(Patient, name='Patient')
 PatientIn_Pydantic = pydantic_model_creator(Patient, name='PatientIn', exclude_readonly=True)
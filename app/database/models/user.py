@@ -5,7 +5,7 @@ from tortoise.contrib.pydantic import pydantic_model_creator
 from passlib.hash import bcrypt
 
 
-class UserRole(enum.Enum):
+class UserRole(str, enum.Enum):
     SECRETARY = 'secretary'
     DOCTOR = 'doctor'
     LABORATORY = 'laboratory'
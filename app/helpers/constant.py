@@ -8,6 +8,15 @@ Constants:
     - ACCESS_TOKEN_EXPIRE (str): The expiration time for access tokens in minutes.
     - SENDGRID_API_KEY (str): The API key for SendGrid service.
     - FROM_EMAIL (str): The email address used as the sender in email communication.
+    - SOCKETIO_COMPRESSION_THRESHOLD (int): The size in bytes from which payloads sent to msgpack Socket.IO clients are deflated.
+    - QUERY_DEBUG (bool): Whether to count and report the SQL queries executed by every request.
+    - QUERY_BUDGET_STRICT (bool): Whether a route going over its query budget fails instead of being reported.
+    - HOST (str): The interface the server listens on when started with 'python main.py'.
+    - PORT (int): The port the server listens on when started with 'python main.py'.
+    - SHUTDOWN_DRAIN_TIMEOUT (float): The seconds in-flight requests are given to finish on shutdown.
+    - SOCKET_RECONNECT_MIN_DELAY (float): The shortest delay in seconds clients are told to wait before reconnecting.
+    - SOCKET_RECONNECT_MAX_DELAY (float): The longest delay in seconds clients are told to wait before reconnecting.
+    - RATE_LIMIT_REDIS_URL (str): The Redis URL used to share rate limits between workers, in-process when empty.
 """
 
 import os
@@ -21,4 +30,17 @@ ALGORITHM = os.getenv('ALGORITHM')
 ACCESS_TOKEN_EXPIRE = os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES')
 
 SENDGRID_API_KEY = os.getenv('SENDGRID_API_KEY')
-FROM_EMAIL = os.getenv('FROM_EMAIL')
\ No newline at end of file
+FROM_EMAIL = os.getenv('FROM_EMAIL')
+
+SOCKETIO_COMPRESSION_THRESHOLD = int(os.getenv('SOCKETIO_COMPRESSION_THRESHOLD', 1024))
+
+QUERY_DEBUG = os.getenv('QUERY_DEBUG', 'false').lower() == 'true'
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', 'false').lower() == 'true'
+
+HOST = os.getenv('HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', 8000))
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', 20))
+SOCKET_RECONNECT_MIN_DELAY = float(os.getenv('SOCKET_RECONNECT_MIN_DELAY', 1))
+SOCKET_RECONNECT_MAX_DELAY = float(os.getenv('SOCKET_RECONNECT_MAX_DELAY', 30))
+
+RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL')
\ No newline at end of file
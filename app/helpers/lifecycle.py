@@ -0,0 +1,192 @@
+"""
+Graceful shutdown of the HTTP and Socket.IO servers.
+
+uvicorn closes its listening socket and every websocket as soon as it receives SIGTERM, so draining has to
+start before its own shutdown. GracefulServer runs the following phases first, each one timed:
+    1. notify_sockets: new HTTP requests get a 503 with 'Retry-After' and new sockets are refused, then every
+       connected client is told to reconnect after a random delay and disconnected, so clients do not all come
+       back at the same moment.
+    2. drain_requests: in-flight HTTP requests, counted by DrainMiddleware until their background tasks are
+       done, are given what is left of SHUTDOWN_DRAIN_TIMEOUT to finish.
+    3. server_shutdown: uvicorn's own shutdown, with the rest of the deadline as its graceful timeout, followed
+       by the lifespan shutdown which closes the database pool (close_db).
+
+A forced exit (a second signal) stops the first two phases early, as it does uvicorn's own waiting.
+The sequence only runs when the application is started through GracefulServer, i.e. with 'python main.py'.
+"""
+
+import asyncio
+import math
+import random
+import time
+import uvicorn
+from contextlib import contextmanager
+from fastapi import status
+from fastapi.responses import JSONResponse
+from app.helpers.constant import SHUTDOWN_DRAIN_TIMEOUT, SOCKET_RECONNECT_MIN_DELAY, SOCKET_RECONNECT_MAX_DELAY
+
+
+class ShutdownState:
+    """
+        Tracks whether the application is draining, how many HTTP requests are in flight and how long
+        each shutdown phase took.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.draining = False
+        self.in_flight = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.timings = {}
+
+    def request_started(self):
+        self.in_flight += 1
+        self.idle.clear()
+
+    def request_finished(self):
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self.idle.set()
+
+
+shutdown_state = ShutdownState()
+
+
+@contextmanager
+def timed(phase: str):
+    """
+        Records the duration of the block as the shutdown phase 'phase'.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        shutdown_state.timings[phase] = time.perf_counter() - started
+
+
+class DrainMiddleware:
+    """
+        ASGI middleware that refuses new HTTP requests while draining and counts the ones in flight.
+        A request is counted until the application returns, i.e. after its streamed body has been sent and
+        its background tasks have run, which a 'call_next' middleware would not wait for.
+
+        Parameters:
+            app (ASGIApp): The application to wrap.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        if shutdown_state.draining:
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={'detail': 'Server is shutting down'},
+                headers={'Retry-After': str(math.ceil(SOCKET_RECONNECT_MAX_DELAY))}
+            )
+            await response(scope, receive, send)
+            return
+        shutdown_state.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            shutdown_state.request_finished()
+
+
+def _never() -> bool:
+    return False
+
+
+async def notify_sockets(servers, should_stop=_never) -> int:
+    """
+        Tells every connected Socket.IO client to reconnect after a jittered delay and disconnects it.
+
+        Parameters:
+            servers (list): The Socket.IO servers.
+            should_stop (callable): Returns True when the shutdown is forced and the remaining clients are left
+                                    to uvicorn.
+
+        Returns:
+            int: The number of clients that were disconnected.
+    """
+    disconnected = 0
+    for server in servers:
+        sids = [sid for sid, _ in server.manager.get_participants('/', None)]
+        for sid in sids:
+            if should_stop():
+                return disconnected
+            delay = random.uniform(SOCKET_RECONNECT_MIN_DELAY, SOCKET_RECONNECT_MAX_DELAY)
+            await server.emit('server_shutdown', {'reconnect_after': round(delay, 2)}, room=sid)
+            await server.disconnect(sid)
+            disconnected += 1
+        await server.shutdown()
+    return disconnected
+
+
+async def drain_requests(timeout: float, should_stop=_never) -> bool:
+    """
+        Waits for the in-flight HTTP requests to finish.
+
+        Parameters:
+            timeout (float): The number of seconds to wait before giving up.
+            should_stop (callable): Returns True when the shutdown is forced and waiting must stop.
+
+        Returns:
+            bool: True if every request finished, False if the deadline was reached or the shutdown was forced first.
+    """
+    deadline = time.monotonic() + timeout
+    # Wake up regularly to notice a forced exit, as uvicorn does while waiting for its connections
+    while not shutdown_state.idle.is_set() and not should_stop():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        try:
+            await asyncio.wait_for(shutdown_state.idle.wait(), min(remaining, 0.1))
+        except asyncio.TimeoutError:
+            pass
+    return shutdown_state.idle.is_set()
+
+
+class GracefulServer(uvicorn.Server):
+    """
+        A uvicorn server that drains HTTP requests and Socket.IO clients before uvicorn stops listening.
+
+        Parameters:
+            config (uvicorn.Config): The server configuration.
+            socket_servers (list): The Socket.IO servers whose clients are told to reconnect.
+    """
+
+    def __init__(self, config: uvicorn.Config, socket_servers):
+        super().__init__(config)
+        self.socket_servers = list(socket_servers)
+
+    async def shutdown(self, sockets=None):
+        deadline = time.monotonic() + SHUTDOWN_DRAIN_TIMEOUT
+        shutdown_state.draining = True
+
+        # A second SIGINT/SIGTERM sets force_exit, which cuts the phases short like uvicorn's own shutdown
+        def forced():
+            return self.force_exit
+
+        with timed('notify_sockets'):
+            disconnected = await notify_sockets(self.socket_servers, forced)
+
+        with timed('drain_requests'):
+            drained = await drain_requests(max(deadline - time.monotonic(), 0), forced)
+        abandoned = shutdown_state.in_flight
+
+        # Whatever is still running gets the rest of the deadline, then uvicorn cancels it
+        self.config.timeout_graceful_shutdown = max(deadline - time.monotonic(), 0)
+        with timed('server_shutdown'):
+            await super().shutdown(sockets)
+
+        print(f"SHUTDOWN: {disconnected} sockets disconnected, "
+              f"{'all requests drained' if drained else f'{abandoned} requests past the deadline'}")
+        for phase, duration in shutdown_state.timings.items():
+            print(f"SHUTDOWN: {phase} took {duration:.3f}s")
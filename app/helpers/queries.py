@@ -0,0 +1,183 @@
+"""
+Development helpers that count and fingerprint the SQL sent by Tortoise ORM.
+
+Every Tortoise client logs the statements it executes on the 'tortoise.db_client' logger. A handler attached
+to that logger records each statement against the QueryLog that is active in the current context, so queries
+are attributed to the request (or test block) that issued them even under concurrent load.
+
+Usage:
+    - QUERY_DEBUG=true adds a middleware that reports the query count of every request in the 'X-Query-Count'
+      header and prints the statements repeated within a single request (likely N+1 patterns).
+    - @max_queries(n) declares the query budget of a route. The middleware reports routes going over it, or
+      raises QueryBudgetExceeded when QUERY_BUDGET_STRICT=true, which is how the tests run.
+    - query_budget(n) is a context manager that raises QueryBudgetExceeded when more than 'n' queries run
+      inside it.
+"""
+
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from tortoise.log import db_client_logger
+from app.helpers.constant import QUERY_BUDGET_STRICT
+
+_WHITESPACE = re.compile(r'\s+')
+
+_current_log: ContextVar = ContextVar('query_log', default=None)
+
+# Number of blocks currently tracking queries, and the logger level to restore when the last one ends
+_tracking = 0
+_previous_level = logging.NOTSET
+
+
+class QueryLog:
+    """
+        Collects the fingerprints of the queries executed while it is active.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    def duplicates(self) -> dict:
+        """
+            Returns the statements executed more than once, mapped to how many times they ran.
+            Values are bound separately by Tortoise, so a loop fetching rows one by one shows up here.
+        """
+        return {query: total for query, total in Counter(self.queries).items() if total > 1}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+        Raised when a block or a route runs more queries than its budget allows.
+    """
+
+
+class _QueryLogHandler(logging.Handler):
+    """
+        Records every statement logged by the Tortoise clients into the active QueryLog.
+    """
+
+    def emit(self, record):
+        query_log = _current_log.get()
+        if query_log is None:
+            return
+        # Statements are logged either alone or as "%s: %s" with their bound values; anything else
+        # (pool creation, transaction notices) is not a query.
+        if record.args and record.msg == '%s: %s':
+            query = record.args[0]
+        elif not record.args:
+            query = record.msg
+        else:
+            return
+        query_log.queries.append(_WHITESPACE.sub(' ', str(query)).strip())
+
+
+_handler = _QueryLogHandler()
+
+
+def _start_tracking():
+    global _tracking, _previous_level
+    if _tracking == 0:
+        _previous_level = db_client_logger.level
+        db_client_logger.addHandler(_handler)
+        db_client_logger.setLevel(logging.DEBUG)
+    _tracking += 1
+
+
+def _stop_tracking():
+    global _tracking
+    _tracking -= 1
+    if _tracking == 0:
+        db_client_logger.removeHandler(_handler)
+        db_client_logger.setLevel(_previous_level)
+
+
+@contextmanager
+def track_queries():
+    """
+        Records the queries executed inside the block.
+
+        Returns:
+            QueryLog: The log collecting the queries of the block.
+    """
+    query_log = QueryLog()
+    token = _current_log.set(query_log)
+    _start_tracking()
+    try:
+        yield query_log
+    finally:
+        _stop_tracking()
+        _current_log.reset(token)
+
+
+def max_queries(budget: int):
+    """
+        Declares the number of queries a route may run, checked by query_debug_middleware.
+
+        Parameters:
+            budget (int): The number of queries the route may run.
+
+        Returns:
+            callable: A decorator storing the budget on the route function, to place below the router decorator.
+    """
+    def decorator(endpoint):
+        endpoint.max_queries = budget
+        return endpoint
+
+    return decorator
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """
+        Fails the block when it runs more than 'max_queries' queries.
+
+        Parameters:
+            max_queries (int): The number of queries the block may run.
+
+        Raises:
+            QueryBudgetExceeded: If the budget is exceeded, listing the statements that were repeated.
+    """
+    with track_queries() as query_log:
+        yield query_log
+    if query_log.count > max_queries:
+        raise QueryBudgetExceeded(
+            f'{query_log.count} queries executed, budget is {max_queries}. Repeated: {query_log.duplicates()}'
+        )
+
+
+async def query_debug_middleware(request, call_next):
+    """
+        HTTP middleware that counts the queries of each request, flags repeated statements and checks the
+        budget declared with max_queries.
+
+        Parameters:
+            request (Request): The incoming request.
+            call_next (callable): The next handler in the middleware chain.
+
+        Returns:
+            Response: The response with an 'X-Query-Count' header.
+
+        Raises:
+            QueryBudgetExceeded: If the route went over its budget and QUERY_BUDGET_STRICT is set.
+    """
+    with track_queries() as query_log:
+        response = await call_next(request)
+    response.headers['X-Query-Count'] = str(query_log.count)
+    for query, total in query_log.duplicates().items():
+        print(f"POSSIBLE N+1 on {request.method} {request.url.path}: {total}x {query}")
+
+    # The router stores the matched route function in the scope while handling the request
+    budget = getattr(request.scope.get('endpoint'), 'max_queries', None)
+    if budget is not None and query_log.count > budget:
+        message = (f'{request.method} {request.url.path} ran {query_log.count} queries, budget is {budget}. '
+                   f'Repeated: {query_log.duplicates()}')
+        if QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        print(f"QUERY BUDGET EXCEEDED: {message}")
+    return response
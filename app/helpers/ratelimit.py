@@ -0,0 +1,252 @@
+"""
+Token-bucket rate limiting for the expensive routes (bcrypt, database writes and outbound emails).
+
+Each bucket holds up to 'limit' tokens and refills continuously at 'limit / period' tokens per second, so a
+client can burst up to 'limit' requests and is then throttled over a sliding 'period'. Buckets are keyed by
+route and by a caller-provided key (client IP, submitted username, authenticated user...).
+
+    - rate_limit(limit, period, key_func) takes a token on every request. rate_limits(*rules) applies several
+      limits to a route and only takes tokens once every one of them allows the request.
+    - FailureLimit(limit, period, key_func) only takes a token when the route reports a failure, e.g. a wrong
+      password, so legitimate traffic never uses up the bucket.
+
+Buckets live in process memory by default. Setting RATE_LIMIT_REDIS_URL shares them through Redis between
+workers; the 'redis' package is only needed in that case.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+from app.helpers.constant import RATE_LIMIT_REDIS_URL
+from app.helpers.security import get_token_payload, oauth2_scheme
+
+
+class MemoryStore:
+    """
+        Keeps the token buckets in a dictionary of the current process, least recently used first.
+        Past 'max_buckets' entries, buckets that have refilled are dropped, then the least recently used ones.
+    """
+
+    max_buckets = 10000
+
+    def __init__(self):
+        self.buckets = OrderedDict()
+
+    async def take(self, key: str, limit: int, period: float, consume: bool = True) -> float:
+        """
+            Takes a token from the bucket of 'key'.
+
+            Parameters:
+                key (str): The bucket to take the token from.
+                limit (int): The capacity of the bucket.
+                period (float): The seconds it takes to refill an empty bucket.
+                consume (bool): Whether to take the token or only check that one is available.
+
+            Returns:
+                float: 0 if a token is available, otherwise the seconds until one becomes available.
+        """
+        now = time.monotonic()
+        rate = limit / period
+        tokens, updated, _ = self.buckets.get(key, (limit, now, now))
+        tokens = min(limit, tokens + (now - updated) * rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+        if not consume:
+            return wait
+        if not wait:
+            tokens -= 1
+        if key not in self.buckets and len(self.buckets) >= self.max_buckets:
+            self._prune(now)
+        # Each bucket remembers when it will be full again, whatever the period of its route
+        self.buckets[key] = (tokens, now, now + (limit - tokens) / rate)
+        self.buckets.move_to_end(key)
+        return wait
+
+    def _prune(self, now: float):
+        for key in [key for key, (_, _, full_at) in self.buckets.items() if full_at <= now]:
+            del self.buckets[key]
+        # Evict down to 90% so the next full scan only happens after many new keys
+        while len(self.buckets) >= self.max_buckets * 0.9:
+            self.buckets.popitem(last=False)
+
+
+class RedisStore:
+    """
+        Keeps the token buckets in Redis so every worker shares the same limits.
+    """
+
+    script = """
+        local limit = tonumber(ARGV[1])
+        local rate = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local consume = ARGV[4] == '1'
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens = tonumber(bucket[1]) or limit
+        local updated = tonumber(bucket[2]) or now
+        tokens = math.min(limit, tokens + math.max(0, now - updated) * rate)
+        local wait = 0
+        if tokens < 1 then
+            wait = (1 - tokens) / rate
+        end
+        if consume then
+            if wait == 0 then
+                tokens = tokens - 1
+            end
+            redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+            redis.call('EXPIRE', KEYS[1], math.ceil(limit / rate))
+        end
+        return tostring(wait)
+    """
+
+    def __init__(self, url: str):
+        from redis import asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.take_script = self.client.register_script(self.script)
+
+    async def take(self, key: str, limit: int, period: float, consume: bool = True) -> float:
+        """
+            Takes a token from the bucket of 'key', atomically on the Redis server.
+
+            Parameters:
+                key (str): The bucket to take the token from.
+                limit (int): The capacity of the bucket.
+                period (float): The seconds it takes to refill an empty bucket.
+                consume (bool): Whether to take the token or only check that one is available.
+
+            Returns:
+                float: 0 if a token is available, otherwise the seconds until one becomes available.
+        """
+        wait = await self.take_script(keys=[f'ratelimit:{key}'],
+                                      args=[limit, limit / period, time.time(), int(consume)])
+        return float(wait)
+
+
+store = RedisStore(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else MemoryStore()
+
+
+async def client_ip(request: Request) -> str:
+    """
+        Keys a bucket by the IP address of the client.
+    """
+    return f'ip:{request.client.host if request.client else "unknown"}'
+
+
+def query_param(name: str):
+    """
+        Keys a bucket by the value of the query parameter 'name', e.g. the email of /forgot-password.
+    """
+    async def key(request: Request) -> str:
+        return f'{name}:{request.query_params.get(name, "").lower()}'
+
+    return key
+
+
+def form_field(name: str):
+    """
+        Keys a bucket by the value of the form field 'name', e.g. the username posted to /token.
+    """
+    async def key(request: Request) -> str:
+        form = await request.form()
+        return f'{name}:{str(form.get(name, "")).lower()}'
+
+    return key
+
+
+async def token_user(request: Request) -> str:
+    """
+        Keys a bucket by the id of the authenticated user. The decoded token is shared with the
+        permission checks of the route, so it is not decoded twice.
+    """
+    payload = await get_token_payload(request, await oauth2_scheme(request))
+    return f'user:{payload.get("id")}'
+
+
+def combined(*key_funcs):
+    """
+        Keys a bucket by several keys at once, e.g. the username together with the client IP.
+    """
+    async def key(request: Request) -> str:
+        return '|'.join([await key_func(request) for key_func in key_funcs])
+
+    return key
+
+
+def too_many_requests(wait: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail='Too many requests',
+        headers={'Retry-After': str(math.ceil(wait))}
+    )
+
+
+def rate_limit(limit: int, period: float, key_func=client_ip):
+    """
+        Creates a dependency that allows 'limit' requests per 'period' seconds for each key of a route.
+
+        Parameters:
+            limit (int): The number of requests allowed in a burst.
+            period (float): The seconds over which 'limit' requests are allowed.
+            key_func (callable): An async function returning the key of the caller from the request.
+
+        Returns:
+            callable: The dependency, which raises HTTP 429 with a 'Retry-After' header when the limit is reached.
+    """
+    return rate_limits((limit, period, key_func))
+
+
+def rate_limits(*rules):
+    """
+        Creates a dependency enforcing several limits on a route, e.g. per client IP and per email address.
+        Every bucket is checked before any token is taken, so a request refused by one limit does not use
+        up the others.
+
+        Parameters:
+            rules (tuple): (limit, period, key_func) tuples, as taken by rate_limit.
+
+        Returns:
+            callable: The dependency, which raises HTTP 429 with the longest 'Retry-After' of the limits reached.
+    """
+    async def limiter(request: Request):
+        buckets = [(f'{request.url.path}:{await key_func(request)}', limit, period)
+                   for limit, period, key_func in rules]
+        wait = max([await store.take(key, limit, period, consume=False) for key, limit, period in buckets])
+        if wait > 0:
+            raise too_many_requests(wait)
+        # A concurrent request may have taken the last token in between, the bucket then reports the wait
+        wait = max([await store.take(key, limit, period) for key, limit, period in buckets])
+        if wait > 0:
+            raise too_many_requests(wait)
+
+    return limiter
+
+
+class FailureLimit:
+    """
+        A dependency that allows 'limit' failures per 'period' seconds for each key of a route. Requests are
+        only refused once the failures recorded by the route with 'record' have used up the bucket.
+
+        Parameters:
+            limit (int): The number of failures allowed in a burst.
+            period (float): The seconds over which 'limit' failures are allowed.
+            key_func (callable): An async function returning the key of the caller from the request.
+    """
+
+    def __init__(self, limit: int, period: float, key_func=client_ip):
+        self.limit = limit
+        self.period = period
+        self.key_func = key_func
+
+    async def key(self, request: Request) -> str:
+        return f'{request.url.path}:failures:{await self.key_func(request)}'
+
+    async def __call__(self, request: Request):
+        wait = await store.take(await self.key(request), self.limit, self.period, consume=False)
+        if wait > 0:
+            raise too_many_requests(wait)
+
+    async def record(self, request: Request):
+        """
+            Records a failure of the caller of 'request'.
+        """
+        await store.take(await self.key(request), self.limit, self.period)
@@ -1,7 +1,8 @@
-import copy, uuid, jwt
+import uuid, jwt
 from datetime import datetime
+from functools import lru_cache
 from app.database.models.user import User, User_Pydantic, UserToken, UserRole
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
 from tortoise import timezone
@@ -16,16 +17,16 @@ async def validate_token(reset_token):
         reset_token (str): The token to be validated.
 
         Returns:
-        dict: A dictionary with the status code and the user ID if the token is valid.
+        dict: A dictionary with the status code and the user if the token is valid.
         JSONResponse: A JSON response with a 404 status code and a message if the token is expired or invalid.
     """
-    user_token = await UserToken.get(token=reset_token)
+    # The user is joined to the token so callers do not fetch it again
+    user_token = await UserToken.get(token=reset_token).select_related('user')
     if user_token is not None:
-        user_id = copy.deepcopy(user_token.user_id)
         diff = datetime.now() - timezone.make_naive(user_token.created_at, timezone=None)
         if diff.total_seconds() < 300:
             await UserToken.filter(token=reset_token).delete()
-            return {'status_code': 200, 'user': user_id}
+            return {'status_code': 200, 'user': user_token.user}
         await UserToken.filter(token=reset_token).delete()
         return JSONResponse(status_code=404, content="Token Expired")
     return JSONResponse(status_code=404, content="Invalid Token")
@@ -50,6 +51,14 @@ async def create_verification_token(user):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Bit assigned to each role, computed once at import so permission checks are a single bitwise AND.
+ROLE_BITS = {role: 1 << index for index, role in enumerate(UserRole)}
+
+# Tokens may carry the role by name ('DOCTOR') or by value ('doctor'); resolve both without enum lookups.
+ROLE_LOOKUP = {key: role for role in UserRole for key in (role, role.name, role.value)}
+
+ALL_ROLES = list(UserRole)
+
 
 async def authenticate_user(username: str, password: str):
     """
@@ -62,7 +71,7 @@ async def authenticate_user(username: str, password: str):
         Returns:
             - User: The authenticated user object if successful, False otherwise.
     """
-    user = await User.get(email=username)
+    user = await User.get_or_none(email=username)
     if not user:
         return False
     if not user.verify_password(password):
@@ -70,12 +79,40 @@ async def authenticate_user(username: str, password: str):
     return user
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_token_payload(request: Request, token: str = Depends(oauth2_scheme)):
+    """
+        Decodes the bearer token once per request and stores the payload on 'request.state'.
+        Every auth dependency of a route depends on this one, so the JWT is never decoded twice.
+
+        Parameters:
+            - request (Request): The incoming request, used to cache the decoded payload.
+            - token (str): The authentication token to decode.
+
+        Returns:
+            - dict: The decoded token payload.
+
+        Raises:
+            - HTTPException: If the token cannot be decoded, raises HTTP 401 Unauthorized.
+    """
+    payload = getattr(request.state, 'token_payload', None)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except jwt.InvalidTokenError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='Invalid token'
+            )
+        request.state.token_payload = payload
+    return payload
+
+
+async def get_current_user(payload: dict = Depends(get_token_payload)):
     """
         Retrieves the current user based on the provided token.
 
         Parameters:
-            - token (str): The authentication token to decode and retrieve the user information.
+            - payload (dict): The decoded token payload shared with the other auth dependencies of the request.
 
         Returns:
             - User_Pydantic: The Pydantic model object representing the current user.
@@ -84,7 +121,6 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             - HTTPException: If the token is invalid or the user information cannot be retrieved, raises HTTP 401 Unauthorized.
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user = await User.get(id=payload.get('id'))
     except:
         raise HTTPException(
@@ -115,9 +151,27 @@ def verify_token(token: str):
         raise HTTPException(status_code=403, detail=str(e))
 
 
+def role_mask(roles) -> int:
+    """
+        Combines a list of roles into a single bitmask.
+
+        Parameters:
+            roles (list): The roles to combine.
+
+        Returns:
+            int: The bitwise OR of the bits of every role.
+    """
+    mask = 0
+    for role in roles:
+        mask |= ROLE_BITS[ROLE_LOOKUP[role]]
+    return mask
+
+
 def has_permission(required_roles: list[UserRole]):
     """
     A function that checks if a user has the required permissions based on their role.
+    The roles are folded into a bitmask when the route is declared, and the same checker is returned
+    for the same set of roles so FastAPI resolves it only once per request.
 
     Parameters:
         required_roles (list): A list of roles that are required to access the resource.
@@ -125,30 +179,28 @@ def has_permission(required_roles: list[UserRole]):
     Returns:
         dict: A dictionary containing user information like id, role, is_doctor status, and token payload.
     """
-    def role_checker(token: str = Depends(oauth2_scheme)):
+    return _role_checker(role_mask(required_roles))
+
+
+@lru_cache(maxsize=None)
+def _role_checker(required_mask: int):
+    async def role_checker(payload: dict = Depends(get_token_payload)):
         """
-            A function that checks the user's role based on the provided token and verifies if the user has the required roles to access a resource.
+            A function that checks the user's role based on the decoded token and verifies if the user has the required roles to access a resource.
 
             Parameters:
-                token (str): The token used for authentication. Defaults to an OAuth2Scheme.
+                payload (dict): The decoded token payload shared through 'get_token_payload'.
 
             Returns:
                 dict: A dictionary containing user information including id, role, is_doctor status, and token payload.
         """
-        payload = verify_token(token)
-        user_role = payload.get('role')
-        user_id: int = payload.get("id")
-        user_role_str: str = payload.get("role")
-
-        try:
-            user_role = UserRole[user_role_str]
-        except KeyError:
+        user_role = ROLE_LOOKUP.get(payload.get("role"))
+        if user_role is None:
             raise HTTPException(status_code=403, detail="Invalid user role")
 
-        is_doctor: bool = user_role == UserRole.DOCTOR
-
-        if user_role not in required_roles:
+        if not ROLE_BITS[user_role] & required_mask:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
-        return {"id": user_id, "role": user_role, "is_doctor": is_doctor, "token_payload": payload}
+        return {"id": payload.get("id"), "role": user_role, "is_doctor": user_role == UserRole.DOCTOR,
+                "token_payload": payload}
 
     return role_checker
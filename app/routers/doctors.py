@@ -1,15 +1,15 @@
-from fastapi import APIRouter, HTTPException
-from app.database.models import user
+from fastapi import APIRouter, Depends, HTTPException
 from app.database.models.patient import PatientDoctor, Patient, Patient_Pydantic
-from app.database.models.user import UserRole, User_Pydantic
+from app.database.models.user import UserRole, User, User_Pydantic
+from app.helpers.security import has_permission, ALL_ROLES
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(has_permission(ALL_ROLES))])
 
 
 @router.get("/doctors", response_model=list[User_Pydantic])
 async def get_doctors():
     try:
-        doctors = await user.filter(role=UserRole.DOCTOR)
+        doctors = await User.filter(role=UserRole.DOCTOR)
         return doctors
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -18,7 +18,7 @@ async def get_doctors():
 @router.get("/doctors/{doctor_id}", response_model=User_Pydantic)
 async def get_doctor(doctor_id: int):
     try:
-        doctor = await user.get(id=doctor_id, role="Doctor")
+        doctor = await User.get(id=doctor_id, role=UserRole.DOCTOR)
         return doctor
     except Exception as e:
         raise HTTPException(status_code=404, detail="Doctor not found")
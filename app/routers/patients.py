@@ -1,18 +1,51 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from tortoise.expressions import Q
 from app.database.models.patient import Patient_Pydantic, Patient, MedicalRecord, MedicalRecord_Pydantic, \
     MedicalRecordIn_Pydantic, PatientIn_Pydantic, PatientDoctor, PatientDoctor_Pydantic
-from app.helpers.security import has_permission
+from app.helpers.queries import max_queries
+from app.helpers.security import has_permission, ALL_ROLES
 from app.database.models.user import UserRole, User, User_Pydantic
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(has_permission(ALL_ROLES))])
+
+MEDICAL_STAFF = [UserRole.DOCTOR, UserRole.LABORATORY]
+ASSIGNING_STAFF = [UserRole.SECRETARY, UserRole.DOCTOR]
+
+# Columns GET /patients may be sorted by, each one is indexed on the patient table
+PATIENT_SORT_FIELDS = {"id", "name", "age"}
 
 
 @router.get("/patients", response_model=list[Patient_Pydantic])
-async def get_patients():
+async def get_patients(created_by: Optional[int] = None, gender: Optional[str] = None,
+                       min_age: Optional[int] = Query(None, ge=0), max_age: Optional[int] = Query(None, ge=0),
+                       sort: str = "id"):
+    """
+        Retrieves the patients matching the given filters, sorted by 'sort'.
+
+        Parameters:
+            - created_by (int): Only patients created by this user.
+            - gender (str): Only patients of this gender.
+            - min_age (int): Only patients at least this old.
+            - max_age (int): Only patients at most this old.
+            - sort (str): The field to sort by, one of 'id', 'name' or 'age', prefixed with '-' for descending order.
+
+        Returns:
+            - list[Patient_Pydantic]: The matching patients.
+    """
+    if sort.removeprefix("-") not in PATIENT_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{sort}'")
+    filters = {}
+    if created_by is not None:
+        filters["created_by_id"] = created_by
+    if gender is not None:
+        filters["gender"] = gender
+    if min_age is not None:
+        filters["age__gte"] = min_age
+    if max_age is not None:
+        filters["age__lte"] = max_age
     try:
-        patients = await Patient.all()
+        patients = await Patient.filter(**filters).order_by(sort)
         return patients
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -56,7 +89,9 @@ async def delete_patient(patient_id: int):
         raise HTTPException(status_code=404, detail="Patient not found")
 
 
-@router.post("/patients/{patient_id}/assign-doctor/{doctor_id}", response_model=PatientDoctor_Pydantic)
+@router.post("/patients/{patient_id}/assign-doctor/{doctor_id}", response_model=PatientDoctor_Pydantic,
+             dependencies=[Depends(has_permission(ASSIGNING_STAFF))])
+@max_queries(3)
 async def assign_doctor_to_patient(patient_id: int, doctor_id: int):
     try:
         patient = await Patient.get(id=patient_id)
@@ -80,7 +115,8 @@ async def get_assigned_doctors(patient_id: int):
         raise HTTPException(status_code=404, detail=str(e))
 
 
-@router.delete("/patients/{patient_id}/unassign-doctor/{doctor_id}")
+@router.delete("/patients/{patient_id}/unassign-doctor/{doctor_id}",
+               dependencies=[Depends(has_permission(ASSIGNING_STAFF))])
 async def unassign_doctor_from_patient(patient_id: int, doctor_id: int):
     try:
         assignment = await PatientDoctor.get(patient_id=patient_id, doctor_id=doctor_id)
@@ -90,7 +126,8 @@ async def unassign_doctor_from_patient(patient_id: int, doctor_id: int):
         raise HTTPException(status_code=404, detail=str(e))
 
 
-@router.get("/patients/{patient_id}/medical-information", response_model=list[MedicalRecord_Pydantic])
+@router.get("/patients/{patient_id}/medical-information", response_model=list[MedicalRecord_Pydantic],
+            dependencies=[Depends(has_permission(MEDICAL_STAFF))])
 async def get_patient_medical_information(patient_id: int):
     try:
         patient = await Patient.get(id=patient_id)
@@ -101,19 +138,21 @@ async def get_patient_medical_information(patient_id: int):
 
 
 @router.post("/patients/{patient_id}/medical-information", response_model=MedicalRecord_Pydantic)
-async def create_medical_record(patient_id: int, medical_record: MedicalRecordIn_Pydantic):
+@max_queries(2)
+async def create_medical_record(patient_id: int, medical_record: MedicalRecordIn_Pydantic,
+                                current_user: dict = Depends(has_permission(MEDICAL_STAFF))):
     try:
         patient = await Patient.get(id=patient_id)
-        doctor_id = medical_record.dict().get("doctor")
-        doctor = await User.get(id=doctor_id)
-        new_medical_record = await MedicalRecord.create(patient=patient, doctor=doctor,
+        # The record is written by the authenticated user, whose id is already in the token
+        new_medical_record = await MedicalRecord.create(patient=patient, doctor_id=current_user["id"],
                                                         **medical_record.dict(exclude_unset=True))
         return new_medical_record
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.put("/patients/{patient_id}/medical-information/{record_id}", response_model=MedicalRecord_Pydantic)
+@router.put("/patients/{patient_id}/medical-information/{record_id}", response_model=MedicalRecord_Pydantic,
+            dependencies=[Depends(has_permission(MEDICAL_STAFF))])
 async def update_medical_record(patient_id: int, record_id: int, medical_record: MedicalRecordIn_Pydantic):
     try:
         patient = await Patient.get(id=patient_id)
@@ -124,7 +163,8 @@ async def update_medical_record(patient_id: int, record_id: int, medical_record:
         raise HTTPException(status_code=404, detail="Patient or medical record not found")
 
 
-@router.delete("/patients/{patient_id}/medical-information/{record_id}")
+@router.delete("/patients/{patient_id}/medical-information/{record_id}",
+               dependencies=[Depends(has_permission(MEDICAL_STAFF))])
 async def delete_medical_record(patient_id: int, record_id: int):
     try:
         patient = await Patient.get(id=patient_id)
@@ -1,28 +1,64 @@
 from typing import List
 
 import jwt
-from app.database.models.user import (User, User_Pydantic, UserIn_Pydantic)
-from app.helpers.constant import DB_URL
+from app.database.models.user import (User, User_Pydantic, UserIn_Pydantic, UserRole)
 from app.helpers.mail import send_mail
+from app.helpers.queries import max_queries
+from app.helpers.ratelimit import FailureLimit, rate_limit, rate_limits, client_ip, combined, form_field, query_param
 from app.helpers.security import (create_verification_token,
                                   validate_token, SECRET_KEY, authenticate_user,
-                                  get_current_user, has_permission)
-from fastapi import APIRouter, Depends, HTTPException, status
+                                  get_current_user, has_permission, ALL_ROLES)
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from passlib.hash import bcrypt
 
+# Registration, login and password recovery are public, so policies are applied per route instead of on the router
 router = APIRouter()
 
+# Failed logins per username and client: attackers only lock themselves out, successful logins cost nothing
+login_failures = FailureLimit(5, 60, combined(form_field('username'), client_ip))
+
+# Roles allowed to edit or delete accounts other than their own
+ACCOUNT_MANAGERS = [UserRole.SECRETARY]
+
+
+async def ensure_can_manage(user_id: int, current_user: dict) -> User:
+    """
+        Checks that the current user still exists and may edit or delete the account 'user_id'.
+        Tokens do not expire, so the account behind the token is looked up again, in the same query as the
+        account being modified.
+
+        Parameters:
+            - user_id: int - the account being modified.
+            - current_user: dict - the user resolved by 'has_permission'.
+
+        Returns:
+            - User: The account being modified.
+
+        Raises:
+            - HTTPException: If the account of the current user was deleted, raises HTTP 401.
+            - HTTPException: If the account belongs to someone else and the user is not an account manager, raises HTTP 403.
+            - HTTPException: If the account being modified does not exist, raises HTTP 404.
+    """
+    if current_user['id'] != user_id and current_user['role'] not in ACCOUNT_MANAGERS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+    users = {user.id: user for user in await User.filter(id__in={user_id, current_user['id']})}
+    if current_user['id'] not in users:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid username or password")
+    if user_id not in users:
+        raise HTTPException(status_code=404, detail="User not found")
+    return users[user_id]
+
 
 @router.get("/health")
 async def health_check():
     """
-        A function to perform a health check, accessible only to admin users.
-        Returns a dictionary containing the health status with the database URL.
+        A function to perform a health check, accessible to load balancers without a token.
+        Returns a dictionary containing the health status, without any configuration detail.
     """
-    return {'Health': DB_URL}
+    return {'Health': 'OK'}
 
 
 @router.post('/users')
@@ -75,44 +111,56 @@ async def get_user(user_id: int, user: UserIn_Pydantic = Depends(get_current_use
 
 
 @router.put('/users/{user_id}', response_model=User_Pydantic)
-async def update_user(user_id: int, user: UserIn_Pydantic = Depends(get_current_user)):
+@max_queries(2)
+async def update_user(user_id: int, user: UserIn_Pydantic,
+                      current_user: dict = Depends(has_permission(ALL_ROLES))):
     """
-        Updates a user's information in the database.
+        Updates a user's information in the database. Users may only update their own account, and
+        only keeping their role, unless their role is one of ACCOUNT_MANAGERS.
 
         Parameters:
             - user_id: int - the unique identifier of the user to update.
             - user: UserIn_Pydantic - the user object containing the updated information.
+            - current_user: dict - the user resolved by 'has_permission'.
 
         Returns:
             - User_Pydantic: The Pydantic model object representing the updated user.
     """
+    if user.role != current_user['role'] and current_user['role'] not in ACCOUNT_MANAGERS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only account managers can change roles")
+    user_obj = await ensure_can_manage(user_id, current_user)
     user.password_hash = bcrypt.hash(user.password_hash)
-    await User.get(id=user_id).update(**user.dict(exclude_unset=True))
-    return await User_Pydantic.from_queryset_single(User.get(id=user_id))
+    changes = user.dict(exclude_unset=True)
+    await user_obj.update_from_dict(changes).save(update_fields=list(changes))
+    return await User_Pydantic.from_tortoise_orm(user_obj)
 
 
 @router.delete('/users/{user_id}')
-async def delete_user(user_id: int, user: UserIn_Pydantic = Depends(get_current_user)):
+async def delete_user(user_id: int, current_user: dict = Depends(has_permission(ALL_ROLES))):
     """
-        Deletes a user from the database based on the provided user_id.
+        Deletes a user from the database based on the provided user_id. Users may only delete their own account
+        unless their role is one of ACCOUNT_MANAGERS.
 
         Parameters:
             - user_id: int - the unique identifier of the user to delete.
-            - user: UserIn_Pydantic - the current user retrieved using 'get_current_user' function.
+            - current_user: dict - the user resolved by 'has_permission'.
 
         Returns:
             - dict: An empty dictionary.
     """
-    await User.filter(id=user_id).delete()
+    user_obj = await ensure_can_manage(user_id, current_user)
+    await user_obj.delete()
     return {}
 
 
-@router.post('/token')
-async def generate_token(form_data: OAuth2PasswordRequestForm = Depends()):
+# The failure bucket only checks, so it runs first and a locked out client does not spend its IP tokens
+@router.post('/token', dependencies=[Depends(login_failures), Depends(rate_limit(20, 60, client_ip))])
+async def generate_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """
         Generates an access token for the user based on the provided OAuth2PasswordRequestForm data.
 
         Parameters:
+            - request: Request - the incoming request, used to record failed attempts.
             - form_data: OAuth2PasswordRequestForm - the form data containing the user's username and password.
 
         Returns:
@@ -120,6 +168,7 @@ async def generate_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """
     user = await authenticate_user(form_data.username, form_data.password)
     if not user:
+        await login_failures.record(request)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Invalid username or password'
@@ -129,7 +178,8 @@ async def generate_token(form_data: OAuth2PasswordRequestForm = Depends()):
     return {'access_token': token, 'token_type': 'bearer'}
 
 
-@router.post('/forgot-password')
+@router.post('/forgot-password', dependencies=[Depends(rate_limits((10, 3600, client_ip),
+                                                                   (3, 900, query_param('email'))))])
 async def forgot_password(email: str):
     """
         Handles the forgot password functionality by sending a password reset token to the user's email.
@@ -140,7 +190,7 @@ async def forgot_password(email: str):
         Returns:
             - None
     """
-    user = await User.get(email=email)
+    user = await User.get_or_none(email=email)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     try:
@@ -156,6 +206,7 @@ async def forgot_password(email: str):
 
 
 @router.post("/reset-password")
+@max_queries(3)
 async def reset_password(reset_token: str, password: str, confirmed_password: str):
     """
         Handles the reset password functionality by validating the reset token, checking password match,
@@ -172,6 +223,8 @@ async def reset_password(reset_token: str, password: str, confirmed_password: st
     """
     result = await validate_token(reset_token)
     if result['status_code'] == 200 and password == confirmed_password:
-        await User.get(id=result['user']).update(password_hash=bcrypt.hash(password))
-        return await User_Pydantic.from_queryset_single(User.get(id=result['user']))
+        user = result['user']
+        user.password_hash = bcrypt.hash(password)
+        await user.save(update_fields=['password_hash'])
+        return await User_Pydantic.from_tortoise_orm(user)
     return result
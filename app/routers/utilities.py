@@ -1,13 +1,14 @@
 from app.helpers.mail import send_mail as mail
-from app.helpers.security import oauth2_scheme
+from app.helpers.ratelimit import rate_limits, client_ip, token_user
+from app.helpers.security import has_permission, ALL_ROLES
 from fastapi import APIRouter, Depends
 
 router = APIRouter()
 
 
-@router.post('/send-mail')
+@router.post('/send-mail', dependencies=[Depends(rate_limits((60, 3600, client_ip), (20, 3600, token_user)))])
 async def send_mail(email: str, subject: str, content: str,
-                    token: str = Depends(oauth2_scheme)):
+                    user: dict = Depends(has_permission(ALL_ROLES))):
     """
         Async function to send an email with the given email, subject, and content.
 
@@ -15,7 +16,7 @@ async def send_mail(email: str, subject: str, content: str,
             email (str): The email address to send the mail to.
             subject (str): The subject of the email.
             content (str): The content/body of the email.
-            token (str): The OAuth2 token for authorization.
+            user (dict): The authorised user resolved by 'has_permission'.
 
         Returns:
             The status code of the email sending response.
@@ -1,49 +1,39 @@
+import zlib
+import msgpack
+import socketio
+from app.helpers.constant import SOCKETIO_COMPRESSION_THRESHOLD
+from app.helpers.lifecycle import shutdown_state
 from app.helpers.security import verify_token
-from main import sio
 from fastapi import HTTPException
 
+# Clients pick their wire format by path: the default JSON parser on /socket.io, or the msgpack parser on
+# /socket.io-msgpack, where payloads travel as binary frames and large ones are deflated (see pack_patient_info).
+# Both servers share the handlers below. Websocket frames on either path also get uvicorn's permessage-deflate.
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+sio_msgpack = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', serializer='msgpack')
+
+SOCKET_SERVERS = {'socket.io': sio, 'socket.io-msgpack': sio_msgpack}
+
 # A dictionary to keep track of online users and their sessions
 online_users = {}
 
-@sio.event
-async def connect(sid, environ):
-    print("A user connected:", sid)
-    # Optionally authenticate and store user session here
-    # You can access the HTTP headers from `environ`
-    token = environ.get('HTTP_AUTHORIZATION')
-    if token:
-        user_id = verify_token(token)  # Implement this function in your auth helpers
-        if user_id:
-            online_users[sid] = user_id
-            await sio.emit('connection_status', {'data': 'Connected successfully'}, room=sid)
-        else:
-            await sio.disconnect(sid)
-    else:
-        await sio.disconnect(sid)
-
-@sio.event
-async def disconnect(sid):
-    print("A user disconnected:", sid)
-    if sid in online_users:
-        del online_users[sid]
-
-@sio.event
-async def send_patient_info(sid, data):
+# The server each session is connected to, so events reach users whatever format they negotiated
+session_servers = {}
+
+
+def pack_patient_info(server, patient_info):
     """
-    A custom event to handle sending patient information to another doctor.
-    Data could contain: {'recipient_id': int, 'patient_info': dict}
+    Prepares patient information for the recipient's server.
+    JSON clients always get the plain dict. Clients that opted into the msgpack path get payloads of
+    SOCKETIO_COMPRESSION_THRESHOLD bytes or more packed and deflated as {'deflated': bytes} to inflate.
     """
-    if sid in online_users:
-        recipient_id = data['recipient_id']
-        patient_info = data['patient_info']
-        # Emit patient info to the recipient if online
-        recipient_sid = get_sid_from_user_id(recipient_id)
-        if recipient_sid:
-            await sio.emit('new_patient_info', patient_info, room=recipient_sid)
-        else:
-            print(f"Recipient user {recipient_id} is not online.")
-    else:
-        print("Unauthorized attempt to send patient information.")
+    if server is not sio_msgpack:
+        return patient_info
+    encoded = msgpack.packb(patient_info)
+    if len(encoded) < SOCKETIO_COMPRESSION_THRESHOLD:
+        return patient_info
+    return {'deflated': zlib.compress(encoded)}
+
 
 def get_sid_from_user_id(user_id):
     """
@@ -54,3 +44,56 @@ def get_sid_from_user_id(user_id):
             return sid
     return None
 
+
+def register(server):
+    """
+    Registers the event handlers on a Socket.IO server.
+    """
+
+    @server.event
+    async def connect(sid, environ):
+        if shutdown_state.draining:
+            # Refuse new sockets while shutting down, the client retries against the next instance
+            return False
+        print("A user connected:", sid)
+        # You can access the HTTP headers from `environ`
+        token = environ.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ')
+        try:
+            payload = verify_token(token) if token else None
+        except HTTPException:
+            payload = None
+        if not payload:
+            return False
+        online_users[sid] = payload.get('id')
+        session_servers[sid] = server
+        await server.emit('connection_status', {'data': 'Connected successfully'}, room=sid)
+
+    @server.event
+    async def disconnect(sid, *args):
+        print("A user disconnected:", sid)
+        online_users.pop(sid, None)
+        session_servers.pop(sid, None)
+
+    @server.event
+    async def send_patient_info(sid, data):
+        """
+        A custom event to handle sending patient information to another doctor.
+        Data could contain: {'recipient_id': int, 'patient_info': dict}
+        """
+        if sid in online_users:
+            recipient_id = data['recipient_id']
+            patient_info = data['patient_info']
+            # Emit patient info to the recipient if online
+            recipient_sid = get_sid_from_user_id(recipient_id)
+            if recipient_sid:
+                recipient_server = session_servers[recipient_sid]
+                await recipient_server.emit('new_patient_info', pack_patient_info(recipient_server, patient_info),
+                                            room=recipient_sid)
+            else:
+                print(f"Recipient user {recipient_id} is not online.")
+        else:
+            print("Unauthorized attempt to send patient information.")
+
+
+for socket_server in SOCKET_SERVERS.values():
+    register(socket_server)
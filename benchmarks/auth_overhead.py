@@ -0,0 +1,101 @@
+"""
+Measures the per-request overhead of the role checks.
+
+Three routes are served from an in-process FastAPI app and called through httpx's ASGI transport:
+    - open: no authentication, the baseline.
+    - decode_per_check: a router policy plus a route policy, each decoding the JWT and looking the role up
+      in the enum, as has_permission did before the token was shared.
+    - shared_payload: the same two policies with has_permission, which decodes once per request and
+      checks the role against a precomputed bitmask.
+
+Usage:
+    python -m benchmarks.auth_overhead [--requests 5000]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault('DB_URL', 'sqlite://:memory:')
+
+import httpx
+import jwt
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from app.database.models.user import UserRole
+from app.helpers.constant import SECRET_KEY, ALGORITHM
+from app.helpers.security import has_permission, oauth2_scheme, ALL_ROLES
+
+MEDICAL_STAFF = [UserRole.DOCTOR, UserRole.LABORATORY]
+
+
+def decode_per_check(required_roles):
+    def role_checker(token: str = Depends(oauth2_scheme)):
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        try:
+            user_role = UserRole(payload.get('role'))
+        except ValueError:
+            raise HTTPException(status_code=403, detail="Invalid user role")
+        if user_role not in required_roles:
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        return {"id": payload.get("id"), "role": user_role, "is_doctor": user_role == UserRole.DOCTOR,
+                "token_payload": payload}
+
+    return role_checker
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get('/open')
+    async def open_route():
+        return {}
+
+    baseline = APIRouter(dependencies=[Depends(decode_per_check(list(UserRole)))])
+
+    @baseline.get('/decode_per_check', dependencies=[Depends(decode_per_check(MEDICAL_STAFF))])
+    async def decode_per_check_route():
+        return {}
+
+    shared = APIRouter(dependencies=[Depends(has_permission(ALL_ROLES))])
+
+    @shared.get('/shared_payload', dependencies=[Depends(has_permission(MEDICAL_STAFF))])
+    async def shared_payload_route():
+        return {}
+
+    app.include_router(baseline)
+    app.include_router(shared)
+    return app
+
+
+async def measure(client, path: str, headers: dict, requests: int) -> float:
+    for _ in range(100):
+        assert (await client.get(path, headers=headers)).status_code == 200
+    started = time.perf_counter()
+    for _ in range(requests):
+        await client.get(path, headers=headers)
+    return (time.perf_counter() - started) / requests
+
+
+async def run(requests: int):
+    token = jwt.encode({'id': 1, 'role': UserRole.DOCTOR.value}, SECRET_KEY, algorithm=ALGORITHM)
+    headers = {'Authorization': f'Bearer {token}'}
+    transport = httpx.ASGITransport(app=make_app())
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        baseline = await measure(client, '/open', headers, requests)
+        print(f'{"route":>18} {"us/request":>12} {"auth us":>10}')
+        print(f'{"open":>18} {baseline * 1e6:>12.1f} {0:>10.1f}')
+        for path in ('/decode_per_check', '/shared_payload'):
+            seconds = await measure(client, path, headers, requests)
+            print(f'{path[1:]:>18} {seconds * 1e6:>12.1f} {(seconds - baseline) * 1e6:>10.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000, help='requests per route')
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Seeds patients and shows the query plan and timing of every filter and sort accepted by GET /patients,
+to check they use the indexes declared on Patient.
+
+Usage:
+    python -m benchmarks.patient_queries [--patients 100000] [--db-url sqlite://:memory:]
+
+Any Tortoise database URL works, e.g. postgres://user@localhost:5432/health365_bench. Use an empty database:
+the schemas are generated and the patients are inserted into it.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault('DB_URL', 'sqlite://:memory:')
+
+from tortoise import Tortoise
+from app.database.models.patient import Patient
+from app.database.models.user import User, UserRole
+
+CASES = {
+    'created_by': {'filters': {'created_by_id': 7}, 'sort': 'id'},
+    'age range': {'filters': {'age__gte': 30, 'age__lte': 35}, 'sort': 'id'},
+    'gender': {'filters': {'gender': 'female'}, 'sort': 'id'},
+    'sort by name': {'filters': {}, 'sort': 'name'},
+    'created_by, sort by -age': {'filters': {'created_by_id': 7}, 'sort': '-age'},
+}
+
+
+def format_plan_row(row) -> str:
+    """
+        Formats a row of the plan returned by the backend: SQLite rows carry a 'detail' column,
+        PostgreSQL returns its JSON plan.
+    """
+    if hasattr(row, 'keys'):
+        row = dict(row)
+        return str(row.get('detail', row))
+    return str(row)
+
+
+async def seed(patients: int):
+    users = [User(email=f'user{index}@health365.test', password_hash='-', role=random.choice(list(UserRole)))
+             for index in range(200)]
+    await User.bulk_create(users)
+    user_ids = [user.id for user in await User.all().only('id')]
+    batch = []
+    for index in range(patients):
+        batch.append(Patient(name=f'Patient {random.randrange(10 ** 6):06d}', age=random.randrange(100),
+                             gender=random.choice(['female', 'male']), address='Erbil',
+                             created_by_id=random.choice(user_ids)))
+        if len(batch) == 5000:
+            await Patient.bulk_create(batch)
+            batch = []
+    await Patient.bulk_create(batch)
+
+
+async def run(patients: int, db_url: str, repeat: int):
+    await Tortoise.init(db_url=db_url,
+                        modules={'models': ['app.database.models.user', 'app.database.models.patient']})
+    await Tortoise.generate_schemas()
+    try:
+        started = time.perf_counter()
+        await seed(patients)
+        print(f'seeded {patients} patients in {time.perf_counter() - started:.1f}s')
+        for name, case in CASES.items():
+            queryset = Patient.filter(**case['filters']).order_by(case['sort'])
+            plan = await queryset.explain()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                rows = await queryset.values_list('id', flat=True)
+            elapsed = (time.perf_counter() - started) / repeat
+            print(f'\n== {name}: {len(rows)} rows, {elapsed * 1000:.2f} ms')
+            for row in plan:
+                print('   ', format_plan_row(row))
+    finally:
+        await Tortoise.close_connections()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, default=100000, help='patients to seed')
+    parser.add_argument('--db-url', default='sqlite://:memory:', help='Tortoise database URL')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of each query')
+    args = parser.parse_args()
+    asyncio.run(run(args.patients, args.db_url, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Compares the bytes on the wire and the CPU cost per 'new_patient_info' message for the JSON and msgpack
+Socket.IO servers, with and without 'pack_patient_info', which deflates large payloads for msgpack clients only.
+
+Usage:
+    python -m benchmarks.socketio_payloads [--messages 20000]
+"""
+
+import argparse
+import os
+import timeit
+
+os.environ.setdefault('DB_URL', 'sqlite://:memory:')
+
+from socketio import packet, msgpack_packet
+from app.helpers.constant import SOCKETIO_COMPRESSION_THRESHOLD
+from app.routers.websocket import sio, sio_msgpack, pack_patient_info
+
+
+def patient_info(records: int) -> dict:
+    """
+        A patient with 'records' medical records, shaped like what doctors send to each other.
+    """
+    return {
+        'patient': {'id': 1042, 'name': 'Jane Doe', 'age': 41, 'gender': 'female', 'address': 'Erbil, Kurdistan'},
+        'medical_records': [
+            {'id': index, 'doctor': 7, 'description': 'Persistent cough and mild fever for five days',
+             'diagnosis': 'Acute bronchitis', 'prescription': 'Amoxicillin 500mg three times daily for 7 days',
+             'status': 'open', 'created_at': '2024-04-30T10:15:00'}
+            for index in range(records)
+        ],
+    }
+
+
+def encode(server, data) -> bytes:
+    """
+        Encodes a 'new_patient_info' event the way the server puts it on the wire.
+    """
+    if server is sio_msgpack:
+        return msgpack_packet.MsgPackPacket(packet.EVENT, data=['new_patient_info', data]).encode()
+    encoded = packet.Packet(packet.EVENT, data=['new_patient_info', data]).encode()
+    # Binary attachments of JSON packets are sent as separate frames after the text frame
+    if isinstance(encoded, list):
+        return b''.join(part if isinstance(part, bytes) else part.encode() for part in encoded)
+    return encoded.encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000, help='messages encoded per measurement')
+    args = parser.parse_args()
+
+    print(f'compression threshold: {SOCKETIO_COMPRESSION_THRESHOLD} bytes')
+    print(f'{"records":>8} {"server":>8} {"deflate":>8} {"bytes":>8} {"us/msg":>8} {"msg/s":>10}')
+    for records in (0, 5, 50, 500):
+        data = patient_info(records)
+        for name, server in (('json', sio), ('msgpack', sio_msgpack)):
+            for gated in (False, True):
+                def send():
+                    return encode(server, pack_patient_info(server, data) if gated else data)
+
+                size = len(send())
+                seconds = timeit.timeit(send, number=args.messages) / args.messages
+                print(f'{records:>8} {name:>8} {"gated" if gated else "off":>8} {size:>8} '
+                      f'{seconds * 1e6:>8.1f} {1 / seconds:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,45 @@
 import socketio
+import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.database.database import init_db
-from app.routers import users, utilities, patients
+from app.database.database import init_db, close_db
+from app.helpers.constant import QUERY_DEBUG, HOST, PORT, SHUTDOWN_DRAIN_TIMEOUT
+from app.helpers.queries import query_debug_middleware
+from app.helpers.lifecycle import GracefulServer, DrainMiddleware, shutdown_state, timed
+from app.routers import users, utilities, patients, doctors
+from app.routers.websocket import sio, sio_msgpack, SOCKET_SERVERS
 
-app = FastAPI()
 
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
-app_asgi = socketio.ASGIApp(sio, app=app)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+        Handles the application lifespan: initializes the database on startup and closes its pool on shutdown.
+        Requests and sockets are drained before this point by GracefulServer.
+    """
+    print("INITIALISING DATABASE")
+    shutdown_state.reset()
+    await init_db()
+    yield
+    with timed('close_db'):
+        await close_db()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(DrainMiddleware)
+if QUERY_DEBUG:
+    app.middleware('http')(query_debug_middleware)
 
 app.include_router(users.router)
 app.include_router(utilities.router)
 app.include_router(patients.router)
+app.include_router(doctors.router)
 
-app.mount('/', app_asgi)
+# The application to serve: Socket.IO traffic goes to the server matching its path, everything else to FastAPI
+app_asgi = socketio.ASGIApp(sio_msgpack, socketio_path='socket.io-msgpack',
+                            other_asgi_app=socketio.ASGIApp(sio, other_asgi_app=app))
 
 
-@app.on_event("startup")
-async def startup_event():
-    """
-        A function that handles the startup event by initializing the database.
-        No parameters are required. Does not return anything.
-    """
-    print("INITIALISING DATABASE")
-    init_db(app)
+if __name__ == '__main__':
+    config = uvicorn.Config(app_asgi, host=HOST, port=PORT, timeout_graceful_shutdown=SHUTDOWN_DRAIN_TIMEOUT)
+    GracefulServer(config, SOCKET_SERVERS.values()).run()
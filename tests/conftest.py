@@ -0,0 +1,58 @@
+import os
+
+# Must be set before the app reads its configuration from the environment
+os.environ['DB_URL'] = 'sqlite://:memory:'
+os.environ['QUERY_DEBUG'] = 'true'
+os.environ['QUERY_BUDGET_STRICT'] = 'true'
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from app.database.models.user import User, UserRole
+from app.helpers import ratelimit
+from app.helpers.constant import SECRET_KEY, ALGORITHM
+from main import app_asgi
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """
+        Gives every test empty rate limit buckets.
+    """
+    ratelimit.store.buckets.clear()
+
+
+@pytest.fixture
+def client():
+    """
+        A test client running the application lifespan against a fresh in-memory database.
+    """
+    with TestClient(app_asgi) as client:
+        yield client
+
+
+@pytest.fixture
+def run(client):
+    """
+        Runs a coroutine function on the event loop of the application, e.g. to seed the database.
+    """
+    def runner(func, *args, **kwargs):
+        async def call():
+            return await func(*args, **kwargs)
+        return client.portal.call(call)
+
+    return runner
+
+
+@pytest.fixture
+def create_user(run):
+    """
+        Creates a user with the given role and returns it with an 'Authorization' header for it.
+    """
+    def factory(role: UserRole, email: str = None):
+        user = run(User.create, email=email or f'{role.value}-{os.urandom(4).hex()}@health365.test',
+                   password_hash='not-a-hash', role=role)
+        token = jwt.encode({'id': user.id, 'role': role.value}, SECRET_KEY, algorithm=ALGORITHM)
+        return user, {'Authorization': f'Bearer {token}'}
+
+    return factory
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import httpx
+import uvicorn
+from fastapi import BackgroundTasks, FastAPI
+from app.helpers.constant import SOCKET_RECONNECT_MIN_DELAY, SOCKET_RECONNECT_MAX_DELAY
+from app.helpers.lifecycle import GracefulServer, DrainMiddleware, drain_requests, notify_sockets, shutdown_state
+
+
+class FakeSocketServer:
+    """
+        Stands in for a Socket.IO server with two connected clients.
+    """
+
+    def __init__(self):
+        self.manager = SimpleNamespace(get_participants=lambda namespace, room: [('a', 'a'), ('b', 'b')])
+        self.emitted = []
+        self.disconnected = []
+        self.stopped = False
+
+    async def emit(self, event, data, room):
+        self.emitted.append((event, data, room))
+
+    async def disconnect(self, sid):
+        self.disconnected.append(sid)
+
+    async def shutdown(self):
+        self.stopped = True
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(DrainMiddleware)
+
+    @app.get('/slow')
+    async def slow():
+        await asyncio.sleep(0.5)
+        return {'done': True}
+
+    return app
+
+
+def test_draining_starts_before_uvicorn_stops_listening():
+    socket_server = FakeSocketServer()
+    server = GracefulServer(uvicorn.Config(make_app(), port=0, log_level='warning', lifespan='off'),
+                            [socket_server])
+
+    async def scenario():
+        shutdown_state.reset()
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}') as client:
+            in_flight = asyncio.create_task(client.get('/slow'))
+            await asyncio.sleep(0.1)
+            # What uvicorn's signal handler does on SIGTERM
+            server.should_exit = True
+            await asyncio.sleep(0.1)
+            refused = await client.get('/slow')
+            finished = await in_flight
+        await serving
+        return refused, finished
+
+    try:
+        refused, finished = asyncio.run(scenario())
+    finally:
+        timings = dict(shutdown_state.timings)
+        shutdown_state.reset()
+
+    assert finished.status_code == 200
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After'].isdigit()
+    assert set(timings) >= {'notify_sockets', 'drain_requests', 'server_shutdown'}
+
+    assert socket_server.disconnected == ['a', 'b']
+    assert socket_server.stopped
+    for event, data, room in socket_server.emitted:
+        assert event == 'server_shutdown'
+        assert SOCKET_RECONNECT_MIN_DELAY <= data['reconnect_after'] <= SOCKET_RECONNECT_MAX_DELAY
+
+
+def test_background_tasks_count_as_in_flight():
+    app = make_app()
+    seen = []
+
+    @app.get('/with-task')
+    async def with_task(background_tasks: BackgroundTasks):
+        background_tasks.add_task(lambda: seen.append(shutdown_state.in_flight))
+        return {}
+
+    async def scenario():
+        shutdown_state.reset()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://testserver') as client:
+            return await client.get('/with-task')
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert seen == [1]
+    assert shutdown_state.in_flight == 0
+
+
+def test_forced_exit_stops_draining():
+    socket_server = FakeSocketServer()
+
+    async def scenario():
+        shutdown_state.reset()
+        shutdown_state.request_started()
+        disconnected = await notify_sockets([socket_server], lambda: True)
+        started = time.monotonic()
+        drained = await drain_requests(30, lambda: True)
+        return disconnected, drained, time.monotonic() - started
+
+    try:
+        disconnected, drained, waited = asyncio.run(scenario())
+    finally:
+        shutdown_state.reset()
+
+    assert disconnected == 0
+    assert socket_server.disconnected == []
+    assert not drained
+    assert waited < 1
@@ -0,0 +1,82 @@
+import logging
+import pytest
+from app.database.models.patient import MedicalRecord, Patient
+from app.database.models.user import User, UserRole
+from app.helpers.queries import QueryBudgetExceeded, query_budget, track_queries
+from app.helpers.security import create_verification_token
+from app.routers.patients import assign_doctor_to_patient
+from tortoise.log import db_client_logger
+
+
+@pytest.fixture
+def patient(run, create_user):
+    secretary, _ = create_user(UserRole.SECRETARY)
+    return run(Patient.create, name='Jane', age=40, gender='female', address='Erbil', created_by=secretary)
+
+
+def test_assign_doctor_to_patient_within_budget(client, create_user, patient):
+    doctor, _ = create_user(UserRole.DOCTOR)
+    _, headers = create_user(UserRole.SECRETARY)
+    response = client.post(f'/patients/{patient.id}/assign-doctor/{doctor.id}', headers=headers)
+    assert response.status_code == 200
+    assert int(response.headers['X-Query-Count']) == 3
+
+
+def test_create_medical_record_within_budget(client, run, create_user, patient):
+    doctor, headers = create_user(UserRole.DOCTOR)
+    response = client.post(f'/patients/{patient.id}/medical-information', headers=headers,
+                           json={'description': 'Cough', 'diagnosis': 'Bronchitis', 'prescription': 'Rest',
+                                 'status': 'open'})
+    assert response.status_code == 200
+    assert int(response.headers['X-Query-Count']) == 2
+    assert run(MedicalRecord.filter(doctor_id=doctor.id).count) == 1
+
+
+def test_update_user_within_budget(client, create_user):
+    doctor, headers = create_user(UserRole.DOCTOR)
+    response = client.put(f'/users/{doctor.id}', headers=headers,
+                          json={'email': 'doctor@health365.test', 'password_hash': 'secret', 'role': 'doctor'})
+    assert response.status_code == 200
+    assert int(response.headers['X-Query-Count']) == 2
+    assert response.json()['email'] == 'doctor@health365.test'
+
+
+def test_reset_password_within_budget(client, run, create_user):
+    doctor, _ = create_user(UserRole.DOCTOR)
+    token = run(create_verification_token, doctor)
+    response = client.post('/reset-password', params={'reset_token': str(token.token), 'password': 'secret',
+                                                      'confirmed_password': 'secret'})
+    assert response.status_code == 200
+    assert int(response.headers['X-Query-Count']) == 3
+    assert run(User.get, id=doctor.id).verify_password('secret')
+
+
+def test_route_over_budget_fails(client, create_user, patient, monkeypatch):
+    doctor, _ = create_user(UserRole.DOCTOR)
+    _, headers = create_user(UserRole.SECRETARY)
+    monkeypatch.setattr(assign_doctor_to_patient, 'max_queries', 1)
+    with pytest.raises(QueryBudgetExceeded, match='budget is 1'):
+        client.post(f'/patients/{patient.id}/assign-doctor/{doctor.id}', headers=headers)
+
+
+def test_query_budget_reports_repeated_queries(run, patient):
+    async def fetch_one_by_one():
+        with query_budget(1):
+            for _ in range(3):
+                await Patient.get(id=patient.id)
+
+    with pytest.raises(QueryBudgetExceeded, match='3 queries executed, budget is 1. Repeated'):
+        run(fetch_one_by_one)
+
+
+def test_tracking_restores_logger_level(run, patient):
+    level = db_client_logger.level
+
+    async def count():
+        with track_queries() as query_log:
+            assert db_client_logger.isEnabledFor(logging.DEBUG)
+            await Patient.all()
+        return query_log.count
+
+    assert run(count) == 1
+    assert db_client_logger.level == level
@@ -0,0 +1,124 @@
+import asyncio
+import fakeredis
+import httpx
+import pytest
+from redis import asyncio as redis
+from app.helpers import ratelimit
+from app.helpers.ratelimit import MemoryStore, RedisStore
+from main import app_asgi
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+        A controllable clock for both stores: the in-memory store reads the monotonic clock, Redis the wall clock.
+    """
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(ratelimit.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def store(request, monkeypatch):
+    """
+        Each store, Redis being replaced by an in-process fake that runs the Lua script.
+    """
+    if request.param == 'memory':
+        return MemoryStore()
+    monkeypatch.setattr(redis, 'from_url', lambda url: fakeredis.FakeAsyncRedis())
+    return RedisStore('redis://localhost')
+
+
+def take(store, key, limit, period, consume=True):
+    return asyncio.run(store.take(key, limit, period, consume=consume))
+
+
+def test_bucket_allows_a_burst_then_refills(clock, store):
+    assert take(store, 'a', 2, 10) == 0
+    assert take(store, 'a', 2, 10) == 0
+    assert take(store, 'a', 2, 10) == pytest.approx(5)
+
+    clock[0] += 5
+    assert take(store, 'a', 2, 10) == 0
+    assert take(store, 'a', 2, 10) == pytest.approx(5)
+
+
+def test_checking_does_not_consume(clock, store):
+    for _ in range(5):
+        assert take(store, 'a', 1, 60, consume=False) == 0
+    assert take(store, 'a', 1, 60) == 0
+    assert take(store, 'a', 1, 60, consume=False) == pytest.approx(60)
+
+
+def test_pruning_keeps_buckets_of_longer_periods(clock):
+    store = MemoryStore()
+    store.max_buckets = 10
+    assert take(store, 'forgot-password', 1, 3600) == 0
+
+    # Short-period buckets fill the store long after a 60 second period, but well within 3600 seconds
+    clock[0] += 120
+    for index in range(20):
+        take(store, f'token-{index}', 5, 60)
+        clock[0] += 61
+
+    assert take(store, 'forgot-password', 1, 3600) > 0
+    assert len(store.buckets) < store.max_buckets
+
+
+def test_store_size_is_capped(clock):
+    store = MemoryStore()
+    store.max_buckets = 10
+    for index in range(100):
+        take(store, f'key-{index}', 1, 3600)
+        assert len(store.buckets) <= store.max_buckets
+
+
+def test_forgot_password_returns_retry_after(client):
+    for _ in range(3):
+        assert client.post('/forgot-password', params={'email': 'nobody@health365.test'}).status_code == 404
+    response = client.post('/forgot-password', params={'email': 'nobody@health365.test'})
+    assert response.status_code == 429
+    # 3 requests per 900 seconds: one comes back every 300 seconds
+    assert response.headers['Retry-After'] == '300'
+
+
+def test_refused_requests_do_not_use_the_other_limits(client):
+    # The email bucket refuses every request after the third, which leaves 7 of the 10 hourly IP tokens
+    for _ in range(12):
+        client.post('/forgot-password', params={'email': 'nobody@health365.test'})
+    for index in range(7):
+        response = client.post('/forgot-password', params={'email': f'other-{index}@health365.test'})
+        assert response.status_code == 404
+
+
+def register(client, email, password):
+    response = client.post('/users', json={'email': email, 'password_hash': password, 'role': 'doctor'})
+    assert response.status_code == 200
+
+
+def test_successful_logins_do_not_use_the_failure_bucket(client):
+    register(client, 'doctor@health365.test', 'secret')
+    for _ in range(10):
+        response = client.post('/token', data={'username': 'doctor@health365.test', 'password': 'secret'})
+        assert response.status_code == 200
+
+
+def test_failed_logins_only_lock_out_the_failing_client(client, run):
+    register(client, 'doctor@health365.test', 'secret')
+    for _ in range(5):
+        response = client.post('/token', data={'username': 'doctor@health365.test', 'password': 'wrong'})
+        assert response.status_code == 401
+
+    response = client.post('/token', data={'username': 'doctor@health365.test', 'password': 'secret'})
+    assert response.status_code == 429
+    # 5 failures per 60 seconds: the next one is allowed within 12 seconds
+    assert 1 <= int(response.headers['Retry-After']) <= 12
+
+    # The same account from another address is not affected
+    async def login_from_other_address():
+        transport = httpx.ASGITransport(app=app_asgi, client=('10.0.0.2', 50000))
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as other_client:
+            return await other_client.post('/token', data={'username': 'doctor@health365.test', 'password': 'secret'})
+
+    assert run(login_from_other_address).status_code == 200
@@ -0,0 +1,83 @@
+from app.database.models.patient import Patient
+from app.database.models.user import UserRole
+
+
+def test_routes_require_a_token(client):
+    assert client.get('/patients').status_code == 401
+    assert client.get('/doctors').status_code == 401
+
+
+def test_invalid_token_is_rejected(client):
+    response = client.get('/patients', headers={'Authorization': 'Bearer not-a-jwt'})
+    assert response.status_code == 401
+
+
+def test_every_role_can_list_patients_and_doctors(client, create_user):
+    for role in UserRole:
+        _, headers = create_user(role)
+        assert client.get('/patients', headers=headers).status_code == 200
+        assert client.get('/doctors', headers=headers).status_code == 200
+
+
+def test_medical_information_is_limited_to_medical_staff(client, run, create_user):
+    secretary, secretary_headers = create_user(UserRole.SECRETARY)
+    _, doctor_headers = create_user(UserRole.DOCTOR)
+    patient = run(Patient.create, name='Jane', age=40, gender='female', address='Erbil', created_by=secretary)
+
+    url = f'/patients/{patient.id}/medical-information'
+    assert client.get(url, headers=secretary_headers).status_code == 403
+    assert client.get(url, headers=doctor_headers).status_code == 200
+
+
+def test_laboratory_cannot_assign_doctors(client, run, create_user):
+    secretary, _ = create_user(UserRole.SECRETARY)
+    doctor, _ = create_user(UserRole.DOCTOR)
+    _, laboratory_headers = create_user(UserRole.LABORATORY)
+    patient = run(Patient.create, name='Jane', age=40, gender='female', address='Erbil', created_by=secretary)
+
+    response = client.post(f'/patients/{patient.id}/assign-doctor/{doctor.id}', headers=laboratory_headers)
+    assert response.status_code == 403
+
+
+def test_users_cannot_delete_other_accounts(client, create_user):
+    doctor, doctor_headers = create_user(UserRole.DOCTOR)
+    other, _ = create_user(UserRole.LABORATORY)
+
+    assert client.delete(f'/users/{other.id}', headers=doctor_headers).status_code == 403
+    assert client.delete(f'/users/{doctor.id}', headers=doctor_headers).status_code == 200
+
+
+def test_secretaries_can_manage_other_accounts(client, create_user):
+    _, secretary_headers = create_user(UserRole.SECRETARY)
+    doctor, _ = create_user(UserRole.DOCTOR)
+
+    response = client.put(f'/users/{doctor.id}', headers=secretary_headers,
+                          json={'email': 'renamed@health365.test', 'password_hash': 'secret', 'role': 'doctor'})
+    assert response.status_code == 200
+    assert response.json()['email'] == 'renamed@health365.test'
+
+
+def test_users_cannot_change_their_own_role(client, create_user):
+    doctor, doctor_headers = create_user(UserRole.DOCTOR)
+
+    response = client.put(f'/users/{doctor.id}', headers=doctor_headers,
+                          json={'email': doctor.email, 'password_hash': 'secret', 'role': 'secretary'})
+    assert response.status_code == 403
+    assert client.get('/users/me', headers=doctor_headers).json()['role'] == 'doctor'
+
+
+def test_deleted_accounts_cannot_modify_users(client, create_user):
+    secretary, secretary_headers = create_user(UserRole.SECRETARY)
+    doctor, _ = create_user(UserRole.DOCTOR)
+    assert client.delete(f'/users/{secretary.id}', headers=secretary_headers).status_code == 200
+
+    assert client.delete(f'/users/{doctor.id}', headers=secretary_headers).status_code == 401
+    response = client.put(f'/users/{doctor.id}', headers=secretary_headers,
+                          json={'email': doctor.email, 'password_hash': 'secret', 'role': 'secretary'})
+    assert response.status_code == 401
+
+
+def test_health_check_does_not_expose_the_configuration(client):
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.json() == {'Health': 'OK'}
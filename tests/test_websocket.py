@@ -0,0 +1,22 @@
+import zlib
+import msgpack
+from app.helpers.constant import SOCKETIO_COMPRESSION_THRESHOLD
+from app.routers.websocket import sio, sio_msgpack, pack_patient_info
+
+
+def test_small_payloads_are_sent_as_is():
+    patient_info = {'name': 'Jane', 'age': 40}
+    assert pack_patient_info(sio, patient_info) is patient_info
+    assert pack_patient_info(sio_msgpack, patient_info) is patient_info
+
+
+def test_json_clients_always_get_the_plain_payload():
+    patient_info = {'notes': 'x' * SOCKETIO_COMPRESSION_THRESHOLD}
+    assert pack_patient_info(sio, patient_info) is patient_info
+
+
+def test_large_msgpack_payloads_are_deflated_in_msgpack():
+    patient_info = {'notes': 'x' * SOCKETIO_COMPRESSION_THRESHOLD}
+    packed = pack_patient_info(sio_msgpack, patient_info)
+    assert len(packed['deflated']) < SOCKETIO_COMPRESSION_THRESHOLD
+    assert msgpack.unpackb(zlib.decompress(packed['deflated'])) == patient_info